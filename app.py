@@ -1,15 +1,17 @@
 import dash
-from dash import dcc, html, Input, Output, State, ctx, no_update
+from dash import dcc, html, Input, Output, State, Patch, ClientsideFunction, ctx, no_update
 import dash_bootstrap_components as dbc
 import uuid
 
 from database import (
     insert_scenario, get_all_scenarios, get_scenario_by_label,
-    delete_scenario, update_scenario
+    delete_scenario, update_scenario, SCENARIO_COLUMNS
 )
 # We import both the scenario-labelling function and the chart-building code
-from plots import plot_multi_scenarios, extract_common_params, format_common_text
-from model import advanced_asset_model  # your advanced model
+from plots import (
+    plot_multi_scenarios, build_scenario_trace, build_hovertemplate,
+    extract_common_params, format_common_text
+)
 from utils import safe_float, safe_int
 
 external_stylesheets = [dbc.themes.BOOTSTRAP]
@@ -22,38 +24,6 @@ fraction_alert = dbc.Alert(
     is_open=False
 )
 
-# --- This function ensures each scenario has a unique "display_label"
-#     by appending "|— N" to duplicates.
-def assign_branch_labels(scenario_list):
-    """
-    Given a list of scenario dicts from the DB, ensure each scenario
-    has a unique 'display_label'. If multiple scenarios share the same
-    scenario['label'], then the 2nd, 3rd, etc. scenario get a suffix
-    like '|— 2', '|— 3', etc.
-
-    If scenario['display_label'] already exists, we skip re-assigning.
-    """
-    label_count = {}
-
-    for sc in scenario_list:
-        # If we already assigned a display_label in a prior pass, skip
-        if "display_label" in sc:
-            continue
-
-        original_label = sc.get("label", "Scenario")
-        # Count how many times we've seen 'original_label'
-        if original_label not in label_count:
-            label_count[original_label] = 1
-            sc["display_label"] = original_label
-        else:
-            label_count[original_label] += 1
-            suffix_num = label_count[original_label]
-            sc["display_label"] = f"{original_label} |— {suffix_num}"
-
-    return scenario_list
-
-
-
 # --- Form with "Starting Age" ---
 form = dbc.Form(
     [
@@ -160,12 +130,24 @@ app.layout = dbc.Container(fluid=True, children=[
         ])
     ]),
     html.Div(id="comparison_table", style={"marginTop": "20px"}),
+    # One row per trace, in trace order: the label plus every column its curve
+    # and meta depend on (see scenario_rows). Tells manage_scenarios whether this
+    # session's figure is current and which dropdown options it already has.
+    dcc.Store(id="scenario_labels"),
 
     html.Div([
         html.H6("Developed by Polumm", style={"textAlign": "center", "fontSize": "12px"}),
     ], style={"marginTop": "30px", "backgroundColor": "#f8f9fa", "padding": "10px"})
 ])
 
+def scenario_rows(scenario_list):
+    """
+    Returns one row per scenario, in trace order: its label followed by every
+    other stored column (model inputs, years, starting_age). Two sessions with
+    equal rows show identical traces; this is what the scenario_labels Store holds.
+    """
+    return [[sc.get(col) for col in SCENARIO_COLUMNS] for sc in scenario_list]
+
 # ----------------------------------------------------------------------------
 # 1) Manage scenarios (Add/Update, Delete) + Build figure + Update dropdown
 # ----------------------------------------------------------------------------
@@ -174,6 +156,7 @@ app.layout = dbc.Container(fluid=True, children=[
     Output('fraction_alert', 'is_open'),
     Output('fraction_alert', 'children'),
     Output('scenario_selector', 'options'),
+    Output('scenario_labels', 'data'),
     Input('add_scenario_button', 'n_clicks'),
     Input('delete_current_scenario', 'n_clicks'),
     State('label', 'value'),
@@ -187,7 +170,8 @@ app.layout = dbc.Container(fluid=True, children=[
     State('annual_return_savings', 'value'),
     State('income_growth_rate', 'value'),
     State('inflation_rate', 'value'),
-    State('years', 'value')
+    State('years', 'value'),
+    State('scenario_labels', 'data')
 )
 def manage_scenarios(
     add_n, delete_n,
@@ -202,11 +186,18 @@ def manage_scenarios(
     sav_return_pct,
     inc_growth_pct,
     inflation_pct,
-    years
+    years,
+    known_rows
 ):
     alert_open = False
     alert_message = ""
     triggered_id = ctx.triggered_id
+    # How the trace list changes: ("insert" | "update" | "delete", label).
+    # Stays None on initial load, which builds the full figure.
+    change = None
+    # Scenario rows as they were before the write, i.e. the traces a
+    # browser that is up to date currently shows.
+    rows_before = None
 
     if triggered_id == 'add_scenario_button':
         i = safe_float(invest_pct)
@@ -218,6 +209,8 @@ def manage_scenarios(
             alert_message = (
                 f"Fractions sum to {frac_sum:.2f}%, not 100%. Please fix them."
             )
+            # Nothing was written, so the figure and dropdown stay as they are.
+            return no_update, alert_open, alert_message, no_update, no_update
         else:
             scenario_data = {
                 "label": label or f"Scenario_{uuid.uuid4()}",
@@ -233,33 +226,73 @@ def manage_scenarios(
                 "years": safe_int(years, 30),
                 "starting_age": safe_int(starting_age, 30),
             }
+            rows_before = scenario_rows(get_all_scenarios())
             existing = get_scenario_by_label(scenario_data["label"])
             if existing:
                 scenario_data["id"] = existing["id"]
                 update_scenario(scenario_data)
+                change = ("update", scenario_data["label"])
             else:
                 insert_scenario(scenario_data)
+                change = ("insert", scenario_data["label"])
 
     elif triggered_id == 'delete_current_scenario':
         if label:
             existing = get_scenario_by_label(label)
             if existing:
+                # Traces follow get_all_scenarios() order, so find the index before deleting.
+                rows_before = scenario_rows(get_all_scenarios())
+                deleted_index = [row[0] for row in rows_before].index(label)
                 delete_scenario(existing["id"])
+                change = ("delete", label)
+        if change is None:
+            return no_update, alert_open, alert_message, no_update, no_update
 
-    # 1) Retrieve scenarios from DB
+    # 1) Retrieve scenarios from DB (each already carries its unique display_label)
     scenario_list = get_all_scenarios()
 
-    # 2) Ensure unique "branch labels" before building the figure
-    scenario_list = assign_branch_labels(scenario_list)
-
-    # 3) Build figure with newly assigned display_label
-    fig = plot_multi_scenarios(scenario_list)
-
-    # 4) Build dropdown options with display_label (instead of label).
+    # 2) Build figure with the assigned display_label. After an add/update/delete,
+    #    only send a Patch: the one changed trace, plus the annotation and hover
+    #    templates, since the common/differing parameters may have shifted.
+    #    The Patch only touches the changed trace, so it only fits this
+    #    browser's figure if the session's Store rows (labels and parameters)
+    #    match the scenarios from before the write; a stale session (another
+    #    tab or user added, deleted or edited a scenario since) gets the full
+    #    figure instead.
+    if change is None or rows_before != known_rows:
+        fig = plot_multi_scenarios(scenario_list)
+    else:
+        action, changed_label = change
+        common, scenario_diffs = extract_common_params(scenario_list)
+        fig = Patch()
+        if action == "delete":
+            del fig["data"][deleted_index]
+        else:
+            index = next(
+                j for j, sc in enumerate(scenario_list) if sc["label"] == changed_label
+            )
+            trace = build_scenario_trace(scenario_list[index], scenario_diffs[index])
+            if action == "insert":
+                fig["data"].insert(index, trace)
+            else:
+                fig["data"][index] = trace
+        # A full rebuild used to make every trace visible again; keep that behaviour.
+        for j, (sc, diff_dict) in enumerate(zip(scenario_list, scenario_diffs)):
+            fig["data"][j]["hovertemplate"] = build_hovertemplate(sc["label"], diff_dict)
+            fig["data"][j]["visible"] = True
+        fig["layout"]["annotations"][0]["text"] = format_common_text(common)
+
+    # 3) Build dropdown options with display_label (instead of label).
     #    But we still keep the 'value' = sc["label"] so user can load the correct scenario by label in DB.
+    #    The options only depend on the labels, so skip them when those haven't changed.
+    rows = scenario_rows(scenario_list)
+    store = no_update if rows == known_rows else rows
+    labels = [row[0] for row in rows]
+    if labels == [row[0] for row in known_rows or []]:
+        return fig, alert_open, alert_message, no_update, store
     selector_options = [{"label": sc["display_label"], "value": sc["label"]} for sc in scenario_list]
 
-    return fig, alert_open, alert_message, selector_options
+    return fig, alert_open, alert_message, selector_options, store
 
 
 # ----------------------------------------------------------------------------
@@ -299,19 +332,24 @@ def toggle_inputs(n, is_open):
         Input('asset_graph', 'clickData'),
         Input('scenario_selector', 'value')
     ],
+    State('scenario_labels', 'data'),
     prevent_initial_call=False
 )
-def populate_form(click_data, selected_label):
+def populate_form(click_data, selected_label, known_rows):
     triggered_id = ctx.triggered_id
     scenario = None
 
     if triggered_id == 'asset_graph' and click_data:
-        try:
-            # We assume customdata = [label, diff_dict]
-            label_clicked = click_data['points'][0]['customdata'][0]
-            scenario = get_scenario_by_label(label_clicked)
-        except:
-            return [no_update]*12 + [no_update]
+        # Resolve the clicked curve against what this browser shows: the
+        # scenario_labels Store is written alongside the figure and holds one
+        # row per trace, label first, in trace order. The server's current
+        # order may have moved on. Guard each step rather than catching
+        # exceptions, so a miss costs no more than a hit.
+        points = click_data.get('points') or []
+        curve = points[0].get('curveNumber') if points else None
+        rows = known_rows or []
+        if curve is not None and 0 <= curve < len(rows):
+            scenario = get_scenario_by_label(rows[curve][0])
 
     elif triggered_id == 'scenario_selector' and selected_label:
         scenario = get_scenario_by_label(selected_label)
@@ -391,6 +429,9 @@ def update_annotation_on_legend_toggle(restyle_data, fig):
     """
     if not restyle_data or not fig:
         return no_update
+    # Only visibility changes affect the common parameters and hover diffs.
+    if isinstance(restyle_data, list) and 'visible' not in (restyle_data[0] or {}):
+        return no_update
 
     data = fig.get('data', [])
     visible_scenarios = []
@@ -401,148 +442,37 @@ def update_annotation_on_legend_toggle(restyle_data, fig):
             if meta:
                 visible_scenarios.append(meta)
 
-    from plots import extract_common_params, format_common_text
     common, diffs = extract_common_params(visible_scenarios)
+    diff_by_label = {d["label"]: d for d in diffs}
 
+    # Only the annotation text and hover templates change, so send a Patch
+    # rather than the whole figure back.
+    patched = Patch()
     if 'layout' in fig and 'annotations' in fig['layout'] and len(fig['layout']['annotations']) > 0:
-        fig['layout']['annotations'][0]['text'] = format_common_text(common)
+        patched['layout']['annotations'][0]['text'] = format_common_text(common)
 
     # Update hover templates.
-    for trace in fig['data']:
+    for j, trace in enumerate(data):
         meta = trace.get('meta')
         if meta and meta in visible_scenarios:
             label = meta.get("label", "Scenario")
-            diff_dict = next((d for d in diffs if d["label"] == label), {})
-            parameter_groups = {}
-            for k, v in diff_dict.items():
-                if k in ["label", "inflation_rate"]:
-                    continue
-                is_percent = any(w in k for w in ['fraction', 'return', 'rate'])
-                if is_percent:
-                    val_str = f"{float(v)*100:.1f}%"
-                else:
-                    val_str = f"{v}"
-                param_label = k.replace("_", " ").title()
-                parameter_groups[param_label] = val_str
-
-            if parameter_groups:
-                diff_html = "<b>Differences:</b><br>"
-                for param, val in parameter_groups.items():
-                    diff_html += f"&nbsp;&nbsp;<b>{param}:</b> {val}<br>"
-            else:
-                diff_html = "<b>No Differences</b><br>"
-
-            hovertemplate = (
-                "<b>Age:</b> %{x}<br>"
-                "<b>Total Asset:</b> %{y:,.2f}<br><br>"
-                f"<b>{label}</b><br>"
-                f"{diff_html}"
-                "<extra></extra>"
-            )
-            trace['hovertemplate'] = hovertemplate
+            diff_dict = diff_by_label.get(label, {})
+            patched['data'][j]['hovertemplate'] = build_hovertemplate(label, diff_dict)
 
-    return fig
+    return patched
 
 
 # ----------------------------------------------------------------------------
 # 6) Update Comparison Table on Initial Load and Legend Toggle
 # ----------------------------------------------------------------------------
-@app.callback(
+# Runs in the browser (assets/tables.js): legend visibility is frontend state,
+# and each trace's meta already carries its scenario and final total asset.
+app.clientside_callback(
+    ClientsideFunction(namespace="tables", function_name="buildCompare"),
     Output('comparison_table', 'children'),
     [Input('asset_graph', 'restyleData'),
      Input('asset_graph', 'figure')]
 )
-def update_comparison_table(restyle_data, fig):
-    """
-    Builds an HTML table comparing key outputs (final age and total asset)
-    and scenario differences for the visible scenarios. This callback now runs
-    on initial load and on legend toggle changes.
-    """
-    if not fig:
-        return no_update
-
-    visible_scenarios = []
-    for trace in fig.get('data', []):
-        visible = trace.get('visible', True)
-        if visible not in [False, 'legendonly']:
-            meta = trace.get('meta')
-            if meta:
-                visible_scenarios.append(meta)
-
-    if not visible_scenarios:
-        return "No scenarios visible."
-
-    # Build header row.
-    header = [html.Th("Parameter")]
-    label_count = {}
-    for sc in visible_scenarios:
-        label = sc.get("label", "Scenario")
-        if label in label_count:
-            label_count[label] += 1
-            display_label = f"{label} |— {label_count[label]}"
-        else:
-            label_count[label] = 1
-            display_label = label
-        # Store display_label for header; it will not be included in the data rows.
-        sc["display_label"] = display_label
-        header.append(html.Th(display_label))
-
-    # Compute final outputs for each scenario.
-    final_info = {}
-    for sc in visible_scenarios:
-        init_asset = float(sc.get('initial_asset', 0.0))
-        ann_income = float(sc.get('annual_income_initial', 0.0))
-        invest_frac = float(sc.get('invest_fraction', 0.0))
-        save_frac = float(sc.get('save_fraction', 0.0))
-        cons_frac = float(sc.get('consumption_fraction', 0.0))
-        inv_ret = float(sc.get('annual_return_investment', 0.0))
-        sav_ret = float(sc.get('annual_return_savings', 0.0))
-        growth = float(sc.get('income_growth_rate', 0.0))
-        inflation = float(sc.get('inflation_rate', 0.0))
-        yrs = int(sc.get('years', 30))
-        start_age = int(sc.get('starting_age', 30))
-        _, total_assets, *_ = advanced_asset_model(
-            init_asset, ann_income, invest_frac, save_frac,
-            cons_frac, inv_ret, sav_ret, growth, inflation, yrs
-        )
-        final_age = start_age + yrs
-        final_asset = total_assets[-1]
-        final_info[sc.get("label")] = {"final_age": final_age, "final_asset": final_asset}
-
-    # Build rows for final outputs.
-    rows = []
-    row_age = [html.Td("Final Age")]
-    row_asset = [html.Td("Final Total Asset")]
-    for sc in visible_scenarios:
-        label = sc.get("label")
-        row_age.append(html.Td(final_info[label]["final_age"]))
-        row_asset.append(html.Td(f"{final_info[label]['final_asset']:,.2f}"))
-    rows.append(html.Tr(row_age))
-    rows.append(html.Tr(row_asset))
-
-    # Build rows for scenario-specific differences.
-    common, scenario_diffs = extract_common_params(visible_scenarios)
-    diff_keys = set()
-    for diff in scenario_diffs:
-        for key in diff:
-            if key != "label" and key.lower() != "display_label":
-                diff_keys.add(key)
-    diff_keys = sorted(diff_keys)
-    for key in diff_keys:
-        row = [html.Td(key.replace("_", " ").title())]
-        for diff in scenario_diffs:
-            val = diff.get(key, "-")
-            if any(x in key for x in ['fraction','return','rate']):
-                if val != "-":
-                    val = f"{float(val)*100:.1f}%"
-            row.append(html.Td(val))
-        rows.append(html.Tr(row))
-
-    table = html.Table(
-        [html.Thead(html.Tr(header))] + [html.Tbody(rows)],
-        style={"width": "100%", "border": "1px solid black", "borderCollapse": "collapse", "textAlign": "center"}
-    )
-    return table
 
 
 if __name__ == '__main__':
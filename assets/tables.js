@@ -0,0 +1,128 @@
+// Clientside callbacks, registered in app.py via ClientsideFunction.
+// Dash serves every file in assets/ automatically.
+
+// Keys that are bookkeeping rather than scenario parameters
+// (mirrors the ignore_keys default of plots.extract_common_params).
+const IGNORE_KEYS = new Set(["id", "label", "display_label", "final_asset"]);
+
+// Parameters stored as fractions and shown as percentages (mirrors plots.PERCENT_KEYS).
+const PERCENT_KEYS = new Set([
+    "invest_fraction", "save_fraction", "consumption_fraction",
+    "annual_return_investment", "annual_return_savings",
+    "income_growth_rate", "inflation_rate",
+]);
+
+function titleCase(key) {
+    return key.split("_").map(w => w.charAt(0).toUpperCase() + w.slice(1)).join(" ");
+}
+
+// True when a restyle event doesn't change trace visibility (e.g. a color change).
+function isNonVisibilityRestyle(restyleData) {
+    return Array.isArray(restyleData) && !("visible" in (restyleData[0] || {}));
+}
+
+// Port of plots.extract_common_params: one dict per scenario holding only
+// the parameters that differ across the given scenarios (plus 'label').
+function scenarioDiffs(scenarios) {
+    const keys = Object.keys(scenarios[0]).filter(k => !IGNORE_KEYS.has(k));
+    const common = new Set(
+        keys.filter(k => new Set(scenarios.map(sc => sc[k])).size === 1)
+    );
+    return scenarios.map(sc => {
+        const diff = {label: sc.label};
+        Object.keys(sc).forEach(k => {
+            if (!IGNORE_KEYS.has(k) && !common.has(k)) {
+                diff[k] = sc[k];
+            }
+        });
+        return diff;
+    });
+}
+
+function el(type, children, props) {
+    return {
+        type: type,
+        namespace: "dash_html_components",
+        props: Object.assign({children: children}, props || {}),
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    tables: {
+        /**
+         * Builds the table comparing key outputs (final age and total asset)
+         * and scenario differences for the visible traces. Runs in the browser,
+         * so legend toggles don't need a server round-trip; each trace's meta
+         * already carries the scenario and its final_asset.
+         */
+        buildCompare: function(restyleData, fig) {
+            if (!fig) {
+                return window.dash_clientside.no_update;
+            }
+            // Only visibility changes affect the table.
+            const triggered = window.dash_clientside.callback_context.triggered.map(t => t.prop_id);
+            if (triggered.length === 1 && triggered[0] === "asset_graph.restyleData"
+                    && isNonVisibilityRestyle(restyleData)) {
+                return window.dash_clientside.no_update;
+            }
+
+            const visible = (fig.data || [])
+                .filter(trace => trace.visible !== false && trace.visible !== "legendonly")
+                .map(trace => trace.meta)
+                .filter(meta => meta);
+
+            if (!visible.length) {
+                return "No scenarios visible.";
+            }
+
+            // Build header row (display_label is assigned when scenarios are read).
+            const header = [el("Th", "Parameter")];
+            visible.forEach(sc => {
+                header.push(el("Th", sc.display_label || sc.label || "Scenario"));
+            });
+
+            // Build rows for final outputs.
+            const rowAge = [el("Td", "Final Age")];
+            const rowAsset = [el("Td", "Final Total Asset")];
+            visible.forEach(sc => {
+                const startAge = sc.starting_age != null ? sc.starting_age : 30;
+                const years = sc.years != null ? sc.years : 30;
+                rowAge.push(el("Td", startAge + years));
+                rowAsset.push(el("Td", Number(sc.final_asset).toLocaleString("en-US", {
+                    minimumFractionDigits: 2,
+                    maximumFractionDigits: 2,
+                })));
+            });
+            const rows = [el("Tr", rowAge), el("Tr", rowAsset)];
+
+            // Build rows for scenario-specific differences.
+            const diffs = scenarioDiffs(visible);
+            const diffKeys = new Set();
+            diffs.forEach(diff => Object.keys(diff).forEach(k => {
+                if (k !== "label") {
+                    diffKeys.add(k);
+                }
+            }));
+            Array.from(diffKeys).sort().forEach(key => {
+                const row = [el("Td", titleCase(key))];
+                diffs.forEach(diff => {
+                    let val = key in diff ? diff[key] : "-";
+                    if (PERCENT_KEYS.has(key) && val !== "-") {
+                        val = `${(Number(val) * 100).toFixed(1)}%`;
+                    }
+                    row.push(el("Td", val));
+                });
+                rows.push(el("Tr", row));
+            });
+
+            return el("Table", [el("Thead", el("Tr", header)), el("Tbody", rows)], {
+                style: {
+                    width: "100%",
+                    border: "1px solid black",
+                    borderCollapse: "collapse",
+                    textAlign: "center",
+                },
+            });
+        },
+    },
+});
@@ -1,5 +1,12 @@
+import logging
 import os
+import threading
+from collections import Counter
+from operator import itemgetter
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
 
 DB_HOST = os.getenv("DATABASE_HOST", "localhost")
 DB_USER = os.getenv("DATABASE_USER", "postgres")
@@ -7,10 +14,11 @@ DB_PASSWORD = os.getenv("DATABASE_PASSWORD", "mysecretpassword")
 DB_NAME = os.getenv("DATABASE_NAME", "assetdb")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(DATABASE_URL, echo=False, pool_size=5, pool_pre_ping=True, future=True)
 
-with engine.connect() as conn:
-    create_table_stmt = text("""
+# SQL statements, built once at import so each call reuses the same TextClause
+# (and SQLAlchemy's cached compiled form) instead of re-parsing the SQL text.
+_CREATE_TABLE = text("""
     CREATE TABLE IF NOT EXISTS scenarios (
         id SERIAL PRIMARY KEY,
         label TEXT UNIQUE NOT NULL,
@@ -27,12 +35,36 @@ with engine.connect() as conn:
         starting_age INTEGER DEFAULT 30
     );
     """)
-    conn.execute(create_table_stmt)
-    conn.commit()
 
+# Older deployments may predate the UNIQUE constraint on label; make sure the
+# lookups by label are backed by a unique index. Tables created above already
+# have one ("label TEXT UNIQUE" builds scenarios_label_key), and IF NOT EXISTS
+# only checks the index name, so look for any plain unique index on label first
+# rather than maintaining two identical btrees.
+_HAS_UNIQUE_LABEL_INDEX = text("""
+    SELECT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'scenarios'::regclass
+          AND i.indisunique
+          AND i.indnkeyatts = 1
+          AND i.indpred IS NULL
+          AND i.indexprs IS NULL
+          AND a.attname = 'label'
+    )
+    """)
+
+_CREATE_LABEL_INDEX = text(
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_scenarios_label ON scenarios(label)"
+)
 
-def insert_scenario(params):
-    insert_stmt = text("""
+# get_all_scenarios sorts the cached rows by label itself, so loading in
+# primary-key order avoids a sort on the DB side.
+_SELECT_ALL = text("SELECT * FROM scenarios ORDER BY id")
+
+# RETURNING id is kept: the scenario cache needs the new row's id.
+_INSERT = text("""
     INSERT INTO scenarios (
         label, initial_asset, annual_income_initial, invest_fraction, 
         save_fraction, consumption_fraction, annual_return_investment,
@@ -43,41 +75,8 @@ def insert_scenario(params):
         :annual_return_savings, :income_growth_rate, :inflation_rate, :years, :starting_age
     ) RETURNING id
     """)
-    with engine.connect() as conn:
-        result = conn.execute(insert_stmt, params)
-        new_id = result.fetchone()[0]
-        conn.commit()
-    return new_id
-
-def get_all_scenarios():
-    select_stmt = text("SELECT * FROM scenarios ORDER BY label ASC")
-    with engine.connect() as conn:
-        result = conn.execute(select_stmt)
-        rows = result.fetchall()
-    scenarios = []
-    for row in rows:
-        scenario_dict = dict(row._mapping)
-        scenarios.append(scenario_dict)
-    return scenarios
-
-def get_scenario_by_label(label):
-    select_stmt = text("SELECT * FROM scenarios WHERE label = :lbl")
-    with engine.connect() as conn:
-        row = conn.execute(select_stmt, {"lbl": label}).fetchone()
-    return dict(row._mapping) if row else None
-
-def delete_scenario(scenario_id):
-    delete_stmt = text("DELETE FROM scenarios WHERE id = :id")
-    with engine.connect() as conn:
-        conn.execute(delete_stmt, {"id": scenario_id})
-        conn.commit()
 
-def update_scenario(params):
-    """
-    Expects params with all columns (including 'id'), or we can do an update by label if you prefer.
-    We'll do it by ID here.
-    """
-    update_stmt = text("""
+_UPDATE = text("""
     UPDATE scenarios
     SET
         initial_asset = :initial_asset,
@@ -93,6 +92,136 @@ def update_scenario(params):
         starting_age = :starting_age
     WHERE id = :id
     """)
+
+_DELETE = text("DELETE FROM scenarios WHERE id = :id")
+
+with engine.begin() as conn:
+    conn.execute(_CREATE_TABLE)
+    has_label_index = conn.execute(_HAS_UNIQUE_LABEL_INDEX).scalar()
+
+if not has_label_index:
+    # A table without the constraint may already hold duplicate labels, which
+    # makes the unique index impossible; don't let that stop the app starting.
+    try:
+        with engine.begin() as conn:
+            conn.execute(_CREATE_LABEL_INDEX)
+    except IntegrityError:
+        logger.warning(
+            "Not creating a unique index on scenarios.label: the table holds "
+            "duplicate labels. Remove the duplicates to get the index on next start."
+        )
+
+# Scenario columns (besides id), in table order.
+SCENARIO_COLUMNS = (
+    "label", "initial_asset", "annual_income_initial", "invest_fraction",
+    "save_fraction", "consumption_fraction", "annual_return_investment",
+    "annual_return_savings", "income_growth_rate", "inflation_rate", "years",
+    "starting_age",
+)
+
+# In-process copy of the scenarios table, keyed by label. Reads are served
+# from here; the write helpers below update it alongside the DB, so it is only
+# (re)loaded from the DB while marked dirty. Dash callbacks can run
+# concurrently, hence the lock.
+_scenario_cache: dict[str, dict] = {}
+_cache_dirty = True
+_cache_lock = threading.Lock()
+
+
+def _load_scenario_cache():
+    """Reloads the cache from the DB. Caller must hold _cache_lock."""
+    global _cache_dirty
     with engine.connect() as conn:
-        conn.execute(update_stmt, params)
-        conn.commit()
+        rows = conn.execute(_SELECT_ALL).mappings().all()
+    _scenario_cache.clear()
+    _scenario_cache.update((row["label"], dict(row)) for row in rows)
+    _cache_dirty = False
+
+def _find_cached_label(scenario_id):
+    """Returns the cached label for a scenario id, or None. Caller must hold _cache_lock."""
+    for label, sc in _scenario_cache.items():
+        if sc["id"] == scenario_id:
+            return label
+    return None
+
+
+# --- This function ensures each scenario has a unique "display_label"
+#     by appending "|— N" to duplicates.
+def assign_branch_labels(scenario_list):
+    """
+    Given a list of scenario dicts from the DB, ensure each scenario
+    has a unique 'display_label'. If multiple scenarios share the same
+    scenario['label'], then the 2nd, 3rd, etc. scenario get a suffix
+    like '|— 2', '|— 3', etc.
+
+    If scenario['display_label'] already exists, we skip re-assigning.
+    """
+    label_count = Counter()
+
+    for sc in scenario_list:
+        # If we already assigned a display_label in a prior pass, skip
+        if "display_label" in sc:
+            continue
+
+        original_label = sc.get("label", "Scenario")
+        # Count how many times we've seen 'original_label'
+        label_count[original_label] += 1
+        n = label_count[original_label]
+        sc["display_label"] = original_label if n == 1 else f"{original_label} |— {n}"
+
+    return scenario_list
+
+
+def insert_scenario(params):
+    with _cache_lock:
+        with engine.begin() as conn:
+            result = conn.execute(_INSERT, params)
+            new_id = result.fetchone()[0]
+        if not _cache_dirty:
+            _scenario_cache[params["label"]] = {
+                "id": new_id, **{col: params.get(col) for col in SCENARIO_COLUMNS}
+            }
+    return new_id
+
+def get_all_scenarios():
+    """
+    Returns all scenarios ordered by label, served from the in-process cache,
+    each with its unique 'display_label' assigned.
+    Each dict is a copy, so callers may annotate it freely.
+    """
+    with _cache_lock:
+        if _cache_dirty:
+            _load_scenario_cache()
+        scenarios = sorted(_scenario_cache.values(), key=itemgetter("label"))
+        return assign_branch_labels([dict(sc) for sc in scenarios])
+
+def get_scenario_by_label(label):
+    with _cache_lock:
+        if _cache_dirty:
+            _load_scenario_cache()
+        scenario = _scenario_cache.get(label)
+        return dict(scenario) if scenario else None
+
+def delete_scenario(scenario_id):
+    with _cache_lock:
+        with engine.begin() as conn:
+            conn.execute(_DELETE, {"id": scenario_id})
+        if not _cache_dirty:
+            label = _find_cached_label(scenario_id)
+            if label is not None:
+                del _scenario_cache[label]
+
+def update_scenario(params):
+    """
+    Expects params with all columns (including 'id'), or we can do an update by label if you prefer.
+    We'll do it by ID here.
+    """
+    with _cache_lock:
+        with engine.begin() as conn:
+            conn.execute(_UPDATE, params)
+        if not _cache_dirty:
+            label = _find_cached_label(params["id"])
+            if label is not None:
+                _scenario_cache[label].update(
+                    {col: params[col] for col in SCENARIO_COLUMNS[1:] if col in params}
+                )
@@ -1,5 +1,30 @@
 import numpy as np 
 
+try:
+    from numba import njit
+except ImportError:
+    # Numba is only a speed-up: without it the models run as plain Python/NumPy.
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# Model inputs as scenario keys, in advanced_asset_model's argument order
+# (years is passed separately).
+MODEL_PARAMS = (
+    "initial_asset", "annual_income_initial", "invest_fraction", "save_fraction",
+    "consumption_fraction", "annual_return_investment", "annual_return_savings",
+    "income_growth_rate", "inflation_rate",
+)
+
+
+# Eager signature: compiled (or loaded from the on-disk cache) at import time,
+# so the first UI interaction doesn't pay the JIT latency.
+@njit(
+    "Tuple((f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:]))"
+    "(f8, f8, f8, f8, f8, f8, f8, f8, f8, i8)",
+    cache=True,
+)
 def advanced_asset_model(
     initial_asset: float,
     annual_income_initial: float,
@@ -21,6 +46,9 @@ def advanced_asset_model(
     This version ignores inflation_rate and uses purely nominal returns.
     If you want to handle inflation, see earlier real-return versions.
 
+    The function is compiled with Numba (nopython mode), so all arguments
+    must be plain numbers and every returned array is float64.
+
     Returns
     -------
     t : np.ndarray
@@ -44,24 +72,24 @@ def advanced_asset_model(
     """
 
     # Time array
-    t = np.arange(years + 1)
-
-    # Prepare arrays
-    investment_account = np.zeros(years + 1)
-    savings_account    = np.zeros(years + 1)
-    total_assets       = np.zeros(years + 1)
-    incomes            = np.zeros(years + 1)
-    initial_asset_only = np.zeros(years + 1)
-    income_contribution_only_inv = np.zeros(years + 1)
-    income_contribution_only_sav = np.zeros(years + 1)
-    income_contribution_only     = np.zeros(years + 1)
+    t = np.arange(years + 1).astype(np.float64)
+
+    # Prepare arrays (every element is written below)
+    investment_account = np.empty(years + 1)
+    savings_account    = np.empty(years + 1)
+    total_assets       = np.empty(years + 1)
+    incomes            = np.empty(years + 1)
+    initial_asset_only = np.empty(years + 1)
+    income_contribution_only_inv = np.empty(years + 1)
+    income_contribution_only_sav = np.empty(years + 1)
+    income_contribution_only     = np.empty(years + 1)
 
     # --- Sanitize / clamp some inputs ---
     initial_asset         = max(initial_asset, 0.0)
     annual_income_initial = max(annual_income_initial, 0.0)
-    invest_fraction       = np.clip(invest_fraction, 0, 1)
-    save_fraction         = np.clip(save_fraction, 0, 1)
-    consumption_fraction  = np.clip(consumption_fraction, 0, 1)
+    invest_fraction       = min(max(invest_fraction, 0.0), 1.0)
+    save_fraction         = min(max(save_fraction, 0.0), 1.0)
+    consumption_fraction  = min(max(consumption_fraction, 0.0), 1.0)
     # If you want to enforce invest_fraction + save_fraction + consumption_fraction = 1,
     # do it before calling this function or clamp the remainder.
 
@@ -87,45 +115,48 @@ def advanced_asset_model(
     income_contribution_only[0]     = 0.0
     total_assets[0] = investment_account[0] + savings_account[0]
 
+    # Loop-invariant growth factors and the share of income that isn't consumed
+    gi = 1.0 + r_inv
+    gs = 1.0 + r_sav
+    gc = 1.0 + r_inc
+    keep_frac = 1.0 - consumption_fraction
+
     # --- Simulation Loop (Years 1..years) ---
+    # Compiled by Numba, so the scalar recurrence runs as native code.
     for i in range(1, years + 1):
-        # 1) Grow last year's balances by nominal returns
-        investment_account[i] = investment_account[i - 1] * (1 + r_inv)
-        savings_account[i]    = savings_account[i - 1]    * (1 + r_sav)
-
-        # 2) Income grows nominally
-        incomes[i] = incomes[i - 1] * (1 + r_inc)
+        # 1) Income grows nominally
+        incomes[i] = incomes[i - 1] * gc
 
-        # 3) The portion of income not consumed
-        leftover = incomes[i] * (1 - consumption_fraction)
+        # 2) The portion of income not consumed
+        leftover = incomes[i] * keep_frac
 
-        # 4) Split leftover into investment vs. savings contributions
+        # 3) Split leftover into investment vs. savings contributions
         invest_contrib = leftover * invest_fraction
         save_contrib   = leftover * save_fraction
 
-        # 5) Add new contributions to accounts
-        investment_account[i] += invest_contrib
-        savings_account[i]    += save_contrib
+        # 4) Grow last year's balances by nominal returns and add new contributions
+        investment_account[i] = investment_account[i - 1] * gi + invest_contrib
+        savings_account[i]    = savings_account[i - 1]    * gs + save_contrib
 
-        # 6) Track the portion from the initial asset alone.
+        # 5) Track the portion from the initial asset alone.
         # For the initial asset, we assume it grows at the investment return rate.
-        initial_asset_only[i] = initial_asset_only[i-1] * (1 + r_inv)
+        initial_asset_only[i] = initial_asset_only[i-1] * gi
 
         # Track new income contributions separately:
         # Investment contributions grow at r_inv.
         income_contribution_only_inv[i] = (
-            income_contribution_only_inv[i-1] * (1 + r_inv) + invest_contrib
+            income_contribution_only_inv[i-1] * gi + invest_contrib
         )
         # Savings contributions grow at r_sav.
         income_contribution_only_sav[i] = (
-            income_contribution_only_sav[i-1] * (1 + r_sav) + save_contrib
+            income_contribution_only_sav[i-1] * gs + save_contrib
         )
         # The total income contributions is the sum of both.
         income_contribution_only[i] = (
             income_contribution_only_inv[i] + income_contribution_only_sav[i]
         )
 
-        # 7) Sum total assets
+        # 6) Sum total assets
         total_assets[i] = investment_account[i] + savings_account[i]
 
     return (
@@ -139,3 +170,87 @@ def advanced_asset_model(
         income_contribution_only_sav,
         income_contribution_only
     )
+
+
+# Eager signature, like advanced_asset_model, so it is compiled at import.
+# Deliberately not parallel=True: N is a handful of scenarios, and without
+# TBB or OpenMP Numba falls back to its workqueue threading layer, which aborts
+# the process when Flask's threaded server calls the kernel concurrently.
+@njit(
+    "Tuple((f8[:], f8[:, :], f8[:, :], f8[:, :], f8[:, :], f8[:, :], f8[:, :], f8[:, :], f8[:, :]))"
+    "(f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], i8[:])",
+    cache=True,
+)
+def advanced_asset_model_batch(
+    initial_asset,
+    annual_income_initial,
+    invest_fraction,
+    save_fraction,
+    consumption_fraction,
+    annual_return_investment,
+    annual_return_savings,
+    income_growth_rate,
+    inflation_rate,  # Not used in this nominal-only approach
+    years
+):
+    """
+    Evaluates advanced_asset_model for N scenarios at once.
+
+    Every argument is a NumPy array of shape (N,), one entry per scenario.
+    All scenarios share a timeline running up to max(years); entries past a
+    scenario's own horizon just continue the same recurrence, so callers
+    should read each row at that scenario's `years` index.
+
+    Each row is produced by the compiled advanced_asset_model, which keeps
+    batched results identical to single-scenario ones.
+
+    Returns
+    -------
+    The same nine outputs as advanced_asset_model, where `t` has shape
+    (max_years + 1,) and the other eight have shape (N, max_years + 1).
+    """
+    n = initial_asset.shape[0]
+    max_years = 0
+    for s in range(n):
+        max_years = max(max_years, years[s])
+
+    # Time array
+    t = np.arange(max_years + 1).astype(np.float64)
+
+    # Prepare arrays (every row is written below)
+    total_assets       = np.empty((n, max_years + 1))
+    investment_account = np.empty((n, max_years + 1))
+    savings_account    = np.empty((n, max_years + 1))
+    incomes            = np.empty((n, max_years + 1))
+    initial_asset_only = np.empty((n, max_years + 1))
+    income_contribution_only_inv = np.empty((n, max_years + 1))
+    income_contribution_only_sav = np.empty((n, max_years + 1))
+    income_contribution_only     = np.empty((n, max_years + 1))
+
+    for s in range(n):
+        res = advanced_asset_model(
+            initial_asset[s], annual_income_initial[s], invest_fraction[s],
+            save_fraction[s], consumption_fraction[s], annual_return_investment[s],
+            annual_return_savings[s], income_growth_rate[s], inflation_rate[s],
+            max_years
+        )
+        total_assets[s]       = res[1]
+        investment_account[s] = res[2]
+        savings_account[s]    = res[3]
+        incomes[s]            = res[4]
+        initial_asset_only[s] = res[5]
+        income_contribution_only_inv[s] = res[6]
+        income_contribution_only_sav[s] = res[7]
+        income_contribution_only[s]     = res[8]
+
+    return (
+        t,
+        total_assets,
+        investment_account,
+        savings_account,
+        incomes,
+        initial_asset_only,
+        income_contribution_only_inv,
+        income_contribution_only_sav,
+        income_contribution_only
+    )
@@ -1,9 +1,23 @@
+from functools import lru_cache
 import numpy as np 
 import plotly.graph_objs as go
-from model import advanced_asset_model
+from model import MODEL_PARAMS, advanced_asset_model_batch
 
-def extract_common_params(scenarios, ignore_keys=("id","label")):
+# Scenario parameters stored as fractions and displayed as percentages.
+PERCENT_KEYS = frozenset({
+    'invest_fraction', 'save_fraction', 'consumption_fraction',
+    'annual_return_investment', 'annual_return_savings',
+    'income_growth_rate', 'inflation_rate',
+})
+
+# Scenario parameters in the (alphabetical) order format_common_text lists them,
+# sorted once here since the schema is fixed.
+_DISPLAY_ORDER = tuple(sorted(MODEL_PARAMS + ('years', 'starting_age')))
+_DISPLAY_KEYS = frozenset(_DISPLAY_ORDER)
+
+def extract_common_params(scenarios, ignore_keys=("id","label","display_label","final_asset")):
     """
+    Ignores bookkeeping keys (DB id, labels, the model's final_asset) by default.
     Returns two things:
       1) a dictionary of param -> value that is the SAME across all scenarios.
       2) a list of scenario-specific dictionaries for each scenario,
@@ -12,23 +26,15 @@ def extract_common_params(scenarios, ignore_keys=("id","label")):
     if not scenarios:
         return {}, []
     keys = [k for k in scenarios[0].keys() if k not in ignore_keys]
-    value_sets = {k: set() for k in keys}
-    for sc in scenarios:
-        for k in keys:
-            value_sets[k].add(sc[k])
-    common = {}
-    for k in keys:
-        if len(value_sets[k]) == 1:
-            common[k] = value_sets[k].pop()
-    scenario_diffs = []
-    for sc in scenarios:
-        diff_dict = {"label": sc["label"]}
-        for k in sc.keys():
-            if k in ignore_keys:
-                continue
-            if k not in common:
-                diff_dict[k] = sc[k]
-        scenario_diffs.append(diff_dict)
+    # Column by column: one set comprehension per key instead of S*K set.add calls.
+    value_sets = {k: {sc[k] for sc in scenarios} for k in keys}
+    common = {k: next(iter(v)) for k, v in value_sets.items() if len(v) == 1}
+    # Scenarios share one schema, so the differing keys are the same for
+    # every scenario: resolve them once instead of per scenario and key.
+    diff_keys = [k for k in keys if k not in common]
+    scenario_diffs = [
+        {"label": sc["label"], **{k: sc[k] for k in diff_keys}} for sc in scenarios
+    ]
     return common, scenario_diffs
 
 def format_percent(val):
@@ -41,11 +47,16 @@ def format_common_text(common, max_chars=120):
     """
     if not common:
         return "No common parameters. All differ!"
+    if _DISPLAY_KEYS.issuperset(common):
+        keys = [k for k in _DISPLAY_ORDER if k in common]
+    else:
+        keys = sorted(common)
     items = []
-    for k, v in sorted(common.items()):
+    for k in keys:
         if k == "inflation_rate":
             continue  # hide from display
-        if any(w in k for w in ['fraction','return','rate']):
+        v = common[k]
+        if k in PERCENT_KEYS:
             val_str = format_percent(float(v))
         else:
             val_str = str(v)
@@ -56,114 +67,218 @@ def format_common_text(common, max_chars=120):
         return full_line
     # wrap lines if too long
     lines = [base_prefix]
-    current_line = ""
-    for item in items:
-        proposed = (current_line + ", " + item) if current_line else item
-        if len(proposed) > max_chars:
-            lines.append(current_line)
-            current_line = item
+    # Track the line length as an int and join each line's items once, when
+    # the line is complete, instead of building strings just to measure them.
+    item_lens = [len(item) for item in items]
+    current_items = []
+    current_len = 0
+    for item, item_len in zip(items, item_lens):
+        sep_len = 2 if current_items else 0
+        if current_len + sep_len + item_len > max_chars:
+            lines.append(", ".join(current_items))
+            current_items = [item]
+            current_len = item_len
         else:
-            current_line = proposed
-    if current_line:
-        lines.append(current_line)
+            current_items.append(item)
+            current_len += sep_len + item_len
+    if current_items:
+        lines.append(", ".join(current_items))
     return "<br>".join(lines)
 
-def plot_multi_scenarios(scenarios):
+@lru_cache(maxsize=1024)
+def _diff_html(diff_items):
     """
-    Builds a Plotly figure showing asset accumulation curves.
-    Each trace stores the full scenario in meta and its specific differences in customdata.
+    Returns the differences block of a hover template for a tuple of
+    (key, type, value) triples. Memoized: scenario sweeps repeat the same
+    differences, and the templates are rebuilt on every redraw and legend toggle.
     """
-    fig = go.Figure()
+    parameter_rows = []
+    for k, _, v in diff_items:
+        if k in PERCENT_KEYS:
+            val_str = f"{float(v) * 100:.1f}%"
+        else:
+            val_str = f"{v}"
+        param_label = k.replace("_", " ").title()
+        parameter_rows.append((param_label, val_str))
 
-    # Extract shared and differing parameters across scenarios.
-    common, scenario_diffs = extract_common_params(scenarios)
+    if parameter_rows:
+        parts = ["<b>Differences:</b><br>"] + [
+            f"&nbsp;&nbsp;<b>{param}:</b> {val}<br>" for param, val in parameter_rows
+        ]
+        return "".join(parts)
+    return "<b>No Differences</b><br>"
 
-    for sc, diff_dict in zip(scenarios, scenario_diffs):
-        label       = sc.get("label", "Scenario")
-        init_asset  = float(sc.get('initial_asset', 0.0))
-        ann_income  = float(sc.get('annual_income_initial', 0.0))
-        invest_frac = float(sc.get('invest_fraction', 0.0))
-        save_frac   = float(sc.get('save_fraction', 0.0))
-        cons_frac   = float(sc.get('consumption_fraction', 0.0))
-        inv_ret     = float(sc.get('annual_return_investment', 0.0))
-        sav_ret     = float(sc.get('annual_return_savings', 0.0))
-        growth      = float(sc.get('income_growth_rate', 0.0))
-        inflation   = float(sc.get('inflation_rate', 0.0))
-        yrs         = int(sc.get('years', 30))
-        start_age   = int(sc.get('starting_age', 30))
-
-        # Timeline.
-        t = np.arange(yrs + 1)
-        age = t + start_age
-
-        # Run asset model.
-        _, total_assets, *_ = advanced_asset_model(
-            init_asset, ann_income, invest_frac, save_frac,
-            cons_frac, inv_ret, sav_ret, growth, inflation, yrs
-        )
-
-        # Store differences in customdata.
-        customdata = [[label, diff_dict] for _ in range(len(age))]
-        
-        # Build differences display (without repeating the label).
-        parameter_groups = {}
-        for k in diff_dict:
-            if k == "label" or k == "inflation_rate":
-                continue
-            is_percent = any(w in k for w in ['fraction','return','rate'])
-            if is_percent:
-                val_str = f"{diff_dict[k] * 100:.1f}%"
-            else:
-                val_str = f"{diff_dict[k]}"
-            param_label = k.replace("_", " ").title()
-            parameter_groups[param_label] = val_str
-
-        if parameter_groups:
-            diff_html = "<b>Differences:</b><br>"
-            for param, val in parameter_groups.items():
-                diff_html += f"&nbsp;&nbsp;<b>{param}:</b> {val}<br>"
-        else:
-            diff_html = "<b>No Differences</b><br>"
-
-        # Consistent hover template.
-        hovertemplate = (
-            "<b>Age:</b> %{x}<br>"
-            "<b>Total Asset:</b> %{y:,.2f}<br><br>"
-            f"<b>{label}</b><br>"
-            f"{diff_html}"
-            "<extra></extra>"
-        )
-        fig.add_trace(go.Scatter(
-            x=age,
-            y=total_assets,
-            mode='lines+markers',
-            name=label,
-            meta=sc,  # full scenario dict.
-            customdata=customdata,
-            hovertemplate=hovertemplate,
-            visible=True
-        ))
-
-    # Annotation for common parameters.
-    annotation_text = format_common_text(common)
-    fig.add_annotation(
-        x=0, y=1.12,
-        xref='paper', yref='paper',
-        text=annotation_text,
-        showarrow=False,
-        align="left",
-        bordercolor="black",
-        borderwidth=1,
-        bgcolor="#f0f0f0",
-        font=dict(size=12)
+def build_hovertemplate(label, diff_dict):
+    """
+    Builds the hover template for one scenario trace: age, total asset,
+    the scenario label and the parameters that differ from the other scenarios.
+    """
+    # Build differences display (without repeating the label). Values are keyed
+    # with their type: 30 and 30.0 are equal as cache keys but display differently.
+    diff_html = _diff_html(tuple(
+        (k, type(v), v) for k, v in diff_dict.items() if k != "label" and k != "inflation_rate"
+    ))
+
+    # Consistent hover template.
+    return (
+        "<b>Age:</b> %{x}<br>"
+        "<b>Total Asset:</b> %{y:,.2f}<br><br>"
+        f"<b>{label}</b><br>"
+        f"{diff_html}"
+        "<extra></extra>"
     )
 
-    # Layout.
-    fig.update_layout(
-        title=" ",
-        xaxis_title="Age",
-        yaxis_title="Total Asset Balance (Nominal)",
-        hovermode="closest",
-        legend_title="Click to in/exclude",
+def _model_key(scenarios):
+    """
+    Returns the model inputs of `scenarios` as a hashable key: the raw bytes of
+    an (N, len(MODEL_PARAMS) + 1) float64 array holding each scenario's
+    MODEL_PARAMS values, then its years. NumPy converts every value in one
+    pass, instead of a float() call per parameter and scenario.
+    """
+    rows = [[sc.get(k, 0.0) for k in MODEL_PARAMS] + [sc.get('years', 30)] for sc in scenarios]
+    return np.array(rows, dtype=np.float64).tobytes()
+
+@lru_cache(maxsize=512)
+def _run_model(key):
+    """
+    Returns total assets for the scenarios described by `key` (see _model_key),
+    one row per scenario on a shared timeline.
+    Memoized, so redrawing the same scenarios skips the model. The cached
+    array is shared between callers, so it is marked read-only.
+    """
+    # One contiguous, writable row per input (frombuffer's view is read-only,
+    # which the compiled kernel's signature doesn't accept).
+    params = np.frombuffer(key, dtype=np.float64).reshape(-1, len(MODEL_PARAMS) + 1).T.copy()
+    yrs = params[-1].astype(np.int64)
+    _, total_assets, *_ = advanced_asset_model_batch(*params[:-1], yrs)
+    total_assets.setflags(write=False)
+    return total_assets
+
+@lru_cache(maxsize=256)
+def _age_axis(yrs, start_age):
+    """
+    Returns the ages start_age ... start_age + yrs. Scenarios mostly share
+    their horizon and starting age, so the array is built once and shared
+    (read-only) between traces.
+    """
+    age = np.arange(start_age, start_age + yrs + 1)
+    age.setflags(write=False)
+    return age
+
+def _lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: returns the indices of the
+    `n_out` points of (x, y) that best preserve the curve's shape, always
+    keeping the first and last point.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 buckets over the interior points; edges[i]:edges[i + 1] is bucket i.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average point of the next bucket (just the last point after the final bucket).
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        ax, ay = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # Pick the point forming the largest triangle with the previous pick and that average.
+        area = np.abs((x[a] - ax) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ay - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+def build_scenario_trace(sc, diff_dict, total_assets=None, max_points_per_trace=200):
+    """
+    Returns the line trace (as a plain dict) for one scenario, running the asset model unless
+    `total_assets` is given (e.g. a row of _run_model output).
+    Curves longer than `max_points_per_trace` are downsampled with LTTB to cut
+    the payload sent to the browser (None disables this).
+    The trace stores the full scenario plus its final total asset in meta;
+    its specific differences are baked into the hover template.
+    """
+    label     = sc.get("label", "Scenario")
+    yrs       = int(sc.get('years', 30))
+    start_age = int(sc.get('starting_age', 30))
+
+    # Timeline.
+    age = _age_axis(yrs, start_age)
+
+    # Run asset model.
+    if total_assets is None:
+        total_assets = _run_model(_model_key((sc,)))[0]
+    # Stays float64: the hover shows balances to the cent, beyond float32's ~7 digits.
+    total_assets = total_assets[:yrs + 1]
+    if max_points_per_trace and len(total_assets) > max_points_per_trace:
+        keep = _lttb_indices(age, total_assets, max_points_per_trace)
+        age, total_assets = age[keep], total_assets[keep]
+
+    # A plain dict rather than go.Scatter: plotly.py would validate every
+    # property of every trace, and the values here are fixed by this module.
+    return dict(
+        # WebGL rather than SVG: with many scenarios, SVG's per-marker DOM
+        # nodes dominate browser render time.
+        type='scattergl',
+        x=age,
+        y=total_assets,
+        mode='lines+markers',
+        name=label,
+        # Full scenario dict; final_asset feeds the clientside comparison table.
+        meta={**sc, "final_asset": float(total_assets[-1])},
+        hovertemplate=build_hovertemplate(label, diff_dict),
+        visible=True
     )
+
+# Static parts of the figure layout, built once instead of being passed through
+# add_annotation/update_layout (and validated) on every redraw.
+_STATIC_LAYOUT = {
+    "title": {"text": " "},
+    "xaxis": {"title": {"text": "Age"}},
+    "yaxis": {"title": {"text": "Total Asset Balance (Nominal)"}},
+    "hovermode": "closest",
+    "legend": {"title": {"text": "Click to in/exclude"}},
+}
+# Box holding the common parameters; only its text changes between redraws.
+_COMMON_ANNOTATION = {
+    "x": 0, "y": 1.12,
+    "xref": "paper", "yref": "paper",
+    "showarrow": False,
+    "align": "left",
+    "bordercolor": "black",
+    "borderwidth": 1,
+    "bgcolor": "#f0f0f0",
+    "font": {"size": 12},
+}
+
+def plot_multi_scenarios(scenarios, max_points_per_trace=200):
+    """
+    Builds a Plotly figure showing asset accumulation curves, one trace per scenario.
+    Each curve is capped at `max_points_per_trace` points (see build_scenario_trace).
+
+    Scenarios are deliberately not merged into a single NaN-separated trace:
+    the app relies on one trace per scenario for legend toggling, for the
+    per-trace meta read by the comparison table, and for the index-based
+    Patch updates in manage_scenarios.
+    """
+    # Extract shared and differing parameters across scenarios.
+    common, scenario_diffs = extract_common_params(scenarios)
+
+    # Run the asset model for all scenarios in one (memoized) batch.
+    total_assets = _run_model(_model_key(scenarios))
+
+    # Traces are built here, so skip plotly.py's per-property validation.
+    traces = [
+        build_scenario_trace(sc, diff_dict, row, max_points_per_trace)
+        for sc, diff_dict, row in zip(scenarios, scenario_diffs, total_assets)
+    ]
+    layout = {
+        **_STATIC_LAYOUT,
+        # Annotation for common parameters.
+        "annotations": [{**_COMMON_ANNOTATION, "text": format_common_text(common)}],
+    }
+    fig = go.Figure(data=traces, layout=layout, _validate=False)
     return fig